@@ -1,17 +1,29 @@
+import orjson
 import os
 import sys
 import time
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 import joblib
 import numpy as np
 import pandas as pd
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, Response
-from sqlalchemy import create_engine
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
 
 load_dotenv()
 
@@ -28,25 +40,113 @@ app = FastAPI(
     title="RTE Consommation API",
     description="API pour consulter les données de consommation électrique française",
     version="1.0.0",
+    # orjson (extension C) sérialise les grosses listes de dicts
+    # plusieurs fois plus vite que le json stdlib
+    default_response_class=ORJSONResponse,
 )
 
 # Configuration base de données
 DATABASE_TYPE = os.getenv("DATABASE_TYPE", "sqlite").lower()
 
+
+def _run_pragmas(dbapi_conn, pragmas):
+    cursor = dbapi_conn.cursor()
+    for pragma in pragmas:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+def _set_sqlite_writer_pragmas(dbapi_conn, _connection_record):
+    """Active WAL et ajuste les pragmas SQLite côté écrivain
+
+    WAL permet les lectures concurrentes pendant les écritures,
+    synchronous=NORMAL réduit les fsync et cache_size=-20000
+    garde ~20 Mo de pages en mémoire.
+    """
+    _run_pragmas(dbapi_conn, (
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        "busy_timeout=5000",
+        "cache_size=-20000",
+        "temp_store=MEMORY",
+        # mmap : les lectures passent par le page-cache noyau sans
+        # copie vers le cache utilisateur (256 Mo couvre toute la base)
+        "mmap_size=268435456",
+    ))
+
+
+def _set_sqlite_reader_pragmas(dbapi_conn, _connection_record):
+    """Pragmas des connexions lecture seule (journal_mode interdit en mode=ro)"""
+    _run_pragmas(dbapi_conn, (
+        "busy_timeout=5000",
+        "cache_size=-20000",
+        "temp_store=MEMORY",
+        "mmap_size=268435456",
+    ))
+
+
 if DATABASE_TYPE == "postgresql":
     host = os.getenv("POSTGRES_HOST", "localhost")
     port = os.getenv("POSTGRES_PORT", "5432")
     db = os.getenv("POSTGRES_DB", "rte_consommation")
     user = os.getenv("POSTGRES_USER", "rte_user")
     password = os.getenv("POSTGRES_PASSWORD", "rte_secure_password")
+    # Pool explicite : les défauts (pool_size=5, pas de pre_ping) provoquent
+    # des reconnexions TCP coûteuses sous charge uvicorn
+    pool_kwargs = dict(
+        pool_size=20,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
     conn_string = f"postgresql://{user}:{password}@{host}:{port}/{db}"
-    engine = create_engine(conn_string)
+    engine = create_engine(conn_string, **pool_kwargs)
+    # Moteur async (asyncpg) : les endpoints de lecture n'occupent plus
+    # un thread du threadpool pendant l'aller-retour base
+    async_engine = create_async_engine(
+        f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{db}", **pool_kwargs
+    )
     logger.info(f"API démarrée avec PostgreSQL: {host}:{port}/{db}")
 else:
     db_path = os.path.abspath("database/rte_consommation.db")
-    engine = create_engine(f"sqlite:///{db_path}")
+    # Deux pools distincts : un écrivain unique (WAL) et des lecteurs
+    # ouverts en mode=ro qui ne prennent jamais le verrou d'écriture
+    engine = create_engine(f"sqlite:///{db_path}", pool_size=1, max_overflow=0)
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///file:{db_path}?mode=ro&uri=true",
+        pool_size=8,
+        max_overflow=0,
+    )
+
+    event.listens_for(engine, "connect")(_set_sqlite_writer_pragmas)
+    event.listens_for(async_engine.sync_engine, "connect")(_set_sqlite_reader_pragmas)
+
     logger.info(f"API démarrée avec SQLite: {db_path}")
 
+
+@app.on_event("startup")
+def warmup_connection_pool():
+    """Pré-remplit le pool de connexions PostgreSQL au démarrage
+
+    Évite les latences de connexion à froid sur les premières requêtes
+    en rafale (handshake TCP + authentification payés une seule fois).
+    """
+    if DATABASE_TYPE != "postgresql":
+        # Une connexion écrivain initiale bascule la base en WAL et crée
+        # les fichiers -wal/-shm dont les lecteurs mode=ro ont besoin
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return
+
+    connections = [engine.connect() for _ in range(10)]
+    for conn in connections:
+        conn.execute(text("SELECT 1"))
+    for conn in connections:
+        conn.close()
+    logger.info("Pool de connexions PostgreSQL pré-rempli (10 connexions)")
+
+
 # Metriques Prometheus
 REQUEST_COUNT = Counter(
     'api_requests_total',
@@ -76,6 +176,73 @@ API_ERRORS = Counter(
     ['endpoint', 'error_type']
 )
 
+# Cache TTL pour les agrégats : les données historiques sont immuables,
+# inutile de re-scanner la table à chaque scrape Prometheus (15s) ou
+# rafraîchissement Streamlit (60s)
+_count_cache = TTLCache(maxsize=1, ttl=60)
+_stats_cache = TTLCache(maxsize=1, ttl=60)
+
+# Requête préparée une seule fois : la limite passe en paramètre lié,
+# ce qui réutilise le cache de compilation SQLAlchemy et le plan SQLite
+CONSO_QUERY = text("SELECT * FROM consumption ORDER BY datetime DESC LIMIT :n")
+
+# Colonnes attendues par le modèle, dans l'ordre d'entraînement
+MODEL_FEATURES = [
+    "hour", "day_of_week", "month", "day_of_month", "is_weekend",
+    "spot_price_eur_mwh", "is_holiday", "is_school_holiday",
+]
+
+MODEL_PATH = Path(__file__).parent.parent / "ml" / "models" / "rte_conso_model.pkl"
+
+
+@lru_cache(maxsize=1)
+def _load_model(mtime):
+    """Charge le modèle une seule fois par version du fichier
+
+    Le mtime en clé invalide le cache quand le pickle est réentraîné ;
+    sinon chaque appel /predict payait un joblib.load complet.
+    """
+    return joblib.load(MODEL_PATH)
+
+
+async def get_record_count():
+    """Nombre d'enregistrements en base (caché 60s)"""
+    try:
+        return _count_cache["count"]
+    except KeyError:
+        pass
+
+    async with async_engine.connect() as conn:
+        result = await conn.execute(text("SELECT COUNT(*) FROM consumption"))
+        count = int(result.scalar())
+
+    _count_cache["count"] = count
+    return count
+
+
+async def get_consumption_stats():
+    """Agrégats moyenne/pic/creux de consommation (cachés 60s)"""
+    try:
+        return _stats_cache["stats"]
+    except KeyError:
+        pass
+
+    async with async_engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                "SELECT AVG(mw_consumption) m, MAX(mw_consumption) p, MIN(mw_consumption) c FROM consumption"
+            )
+        )
+        row = result.one()
+
+    stats = {
+        "moyenne": round(row.m),
+        "pic": round(row.p),
+        "creux": round(row.c),
+    }
+    _stats_cache["stats"] = stats
+    return stats
+
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -169,16 +336,25 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 
 @app.get("/metrics")
-def metrics():
+async def metrics():
     """Endpoint Prometheus pour exposition des metriques"""
     try:
         # Mettre a jour metrique nombre d'enregistrements
-        count = pd.read_sql("SELECT COUNT(*) cnt FROM consumption", engine).iloc[0]["cnt"]
-        DB_RECORDS.set(count)
+        DB_RECORDS.set(await get_record_count())
     except Exception as e:
         logger.error(f"Erreur lors de la mise a jour des metriques: {str(e)}")
 
-    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    # En multi-workers uvicorn, chaque process a ses propres compteurs :
+    # le collecteur multiprocess agrège les fichiers partagés du
+    # répertoire PROMETHEUS_MULTIPROC_DIR
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        payload = generate_latest(registry)
+    else:
+        payload = generate_latest()
+
+    return Response(content=payload, media_type=CONTENT_TYPE_LATEST)
 
 
 @app.head("/")
@@ -188,14 +364,12 @@ def root_head():
 
 
 @app.get("/")
-def root():
+async def root():
     """Endpoint racine - vérification de l'état de l'API"""
     try:
-        count = pd.read_sql("SELECT COUNT(*) cnt FROM consumption", engine).iloc[0][
-            "cnt"
-        ]
+        count = await get_record_count()
         logger.info(f"Vérification santé API: {count} enregistrements en base")
-        return {"status": "OK", "lignes": int(count)}
+        return {"status": "OK", "lignes": count}
     except Exception as e:
         logger.error(
             f"Erreur lors de la vérification de santé: {str(e)}", exc_info=True
@@ -205,9 +379,28 @@ def root():
         )
 
 
+async def _stream_conso_ndjson(limit):
+    """Générateur NDJSON : lit le curseur par blocs de 256 lignes
+
+    Garde O(bloc) lignes en mémoire au lieu de matérialiser les
+    `limit` enregistrements avant sérialisation.
+    """
+    async with async_engine.connect() as conn:
+        conn = await conn.execution_options(stream_results=True, max_row_buffer=256)
+        result = await conn.stream(CONSO_QUERY, {"n": limit})
+        async for row in result.mappings():
+            # orjson comme le reste de l'API (ORJSONResponse) : la
+            # sérialisation C évite le json stdlib sur le chemin chaud
+            yield orjson.dumps(dict(row), default=str) + b"\n"
+
+
 @app.get("/conso")
-def conso(limit: Optional[int] = 24):
-    """Récupérer les données de consommation récentes"""
+async def conso(limit: Optional[int] = 24, stream: bool = False):
+    """Récupérer les données de consommation récentes
+
+    Avec `stream=true`, la réponse est renvoyée en NDJSON ligne par
+    ligne sans matérialiser tout le résultat en mémoire.
+    """
     try:
         if limit <= 0: # type: ignore
             logger.warning(f"Limite invalide demandée: {limit}")
@@ -219,11 +412,20 @@ def conso(limit: Optional[int] = 24):
             logger.warning(f"Limite trop élevée demandée: {limit}, limitée à 1000")
             limit = 1000
 
-        df = pd.read_sql(
-            f"SELECT * FROM consumption ORDER BY datetime DESC LIMIT {limit}", engine
-        )
-        logger.info(f"Récupération de {len(df)} enregistrements de consommation")
-        return df.to_dict("records")
+        if stream:
+            logger.info(f"Streaming NDJSON de {limit} enregistrements de consommation")
+            return StreamingResponse(
+                _stream_conso_ndjson(limit), media_type="application/x-ndjson"
+            )
+
+        # Exécution directe : pas de DataFrame intermédiaire pour
+        # retourner une simple liste de dicts
+        async with async_engine.connect() as conn:
+            result = await conn.execute(CONSO_QUERY, {"n": limit})
+            rows = result.mappings().all()
+
+        logger.info(f"Récupération de {len(rows)} enregistrements de consommation")
+        return [dict(row) for row in rows]
 
     except HTTPException:
         raise
@@ -237,20 +439,10 @@ def conso(limit: Optional[int] = 24):
 
 
 @app.get("/stats")
-def stats():
+async def stats():
     """Statistiques globales de consommation"""
     try:
-        stats_df = pd.read_sql(
-            "SELECT AVG(mw_consumption) m, MAX(mw_consumption) p, MIN(mw_consumption) c FROM consumption",
-            engine,
-        ).iloc[0]
-
-        result = {
-            "moyenne": round(stats_df.m),
-            "pic": round(stats_df.p),
-            "creux": round(stats_df.c),
-        }
-
+        result = await get_consumption_stats()
         logger.info(f"Statistiques calculées: {result}")
         return result
 
@@ -268,11 +460,10 @@ def predict(limit: Optional[int] = 168):
         if limit <= 0 or limit > 1000: # type: ignore
             raise HTTPException(status_code=400, detail="Limite invalide (1-1000)")
 
-        model_path = Path(__file__).parent.parent / "ml" / "models" / "rte_conso_model.pkl"
-        if not model_path.exists():
+        if not MODEL_PATH.exists():
             raise HTTPException(status_code=503, detail="Modèle ML non disponible")
 
-        model = joblib.load(model_path)
+        model = _load_model(MODEL_PATH.stat().st_mtime)
 
         df = pd.read_sql(
             f"SELECT * FROM consumption ORDER BY datetime DESC LIMIT {limit}", engine
@@ -280,19 +471,21 @@ def predict(limit: Optional[int] = 168):
         df["datetime"] = pd.to_datetime(df["datetime"])
         df = df.sort_values("datetime")
 
-        df["hour"] = df["datetime"].dt.hour
-        df["day_of_week"] = df["datetime"].dt.dayofweek 
-        df["month"] = df["datetime"].dt.month
-        df["day_of_month"] = df["datetime"].dt.day
-        df["is_weekend"] = (df["day_of_week"] >= 5).astype(int)
+        # Features temporelles en un passage : un seul DatetimeIndex
+        # au lieu de cinq accès .dt qui re-décodent la colonne
+        dt_index = pd.DatetimeIndex(df["datetime"])
+        df["hour"] = dt_index.hour
+        df["day_of_week"] = dt_index.dayofweek
+        df["month"] = dt_index.month
+        df["day_of_month"] = dt_index.day
+        df["is_weekend"] = (dt_index.dayofweek >= 5).astype(int)
         df["spot_price_eur_mwh"] = 85.0
         df["is_holiday"] = 0
         df["is_school_holiday"] = 0
 
-        features = ["hour", "day_of_week", "month", "day_of_month", "is_weekend",
-                    "spot_price_eur_mwh", "is_holiday", "is_school_holiday"]
-
-        df["mw_predicted"] = model.predict(df[features]).round(0)
+        # Inférence en un seul lot : toutes les lignes passent dans un
+        # unique appel predict au lieu d'un appel par échantillon
+        df["mw_predicted"] = model.predict(df[MODEL_FEATURES]).round(0)
 
         result = df[["datetime", "mw_consumption", "mw_predicted"]].copy()
         result["datetime"] = result["datetime"].astype(str)
@@ -309,5 +502,19 @@ def predict(limit: Optional[int] = 168):
 if __name__ == "__main__":
     import uvicorn
 
-    logger.info("Démarrage du serveur uvicorn sur port 8000")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Multi-workers + uvloop/httptools : l'API lecture seule scale
+    # avec les coeurs et l'event loop C est ~2x plus rapide.
+    # Les endpoints de lecture (/, /conso, /stats) sont `async def` sur
+    # le moteur asynchrone : les I/O base se font sans bloquer la loop.
+    # Seul /predict reste un `def` synchrone (inférence CPU-bound) que
+    # FastAPI exécute dans le threadpool.
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    logger.info(f"Démarrage du serveur uvicorn sur port 8000 ({workers} workers)")
+    uvicorn.run(
+        "api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+    )
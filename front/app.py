@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import time
 import plotly.graph_objects as go
@@ -11,10 +12,23 @@ st.markdown("Data Engineering")
 
 API_BASE = "http://localhost:8000"
 
+
+@st.cache_resource
+def get_session():
+    """Session HTTP partagée : keep-alive vers l'API FastAPI
+
+    Réutilise la même socket TCP pour /stats, /conso et /predict au
+    lieu de payer un handshake par appel.
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+
 @st.cache_data(ttl=60)
 def fetch_data(endpoint):
     try:
-        response = requests.get(f"{API_BASE}{endpoint}", timeout=10)
+        response = get_session().get(f"{API_BASE}{endpoint}", timeout=10)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -22,6 +36,43 @@ def fetch_data(endpoint):
         st.info("Vérifie: uvicorn api.main:app --port 8001")
         return None
 
+@st.cache_resource(ttl=60)
+def build_prediction_figure(predictions):
+    """Figure réel vs prédiction, mémoïsée entre les reruns Streamlit
+
+    cache_resource garde la Figure construite : les interactions
+    widgets ne repayent pas la construction des traces.
+    """
+    x = [r['datetime'] for r in predictions]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=x, y=[r['mw_consumption'] for r in predictions],
+        name='Consommation réelle', line=dict(color='#1f77b4')
+    ))
+    fig.add_trace(go.Scatter(
+        x=x, y=[r['mw_predicted'] for r in predictions],
+        name='Prédiction ML', line=dict(color='#ff7f0e', dash='dash')
+    ))
+    fig.update_layout(
+        title="Consommation réelle vs Prédiction ML (7 derniers jours)",
+        height=400,
+        legend=dict(orientation="h", y=1.1)
+    )
+    return fig
+
+
+@st.cache_resource(ttl=60)
+def build_conso_figure(rows):
+    """Figure consommation seule (fallback sans modèle), mémoïsée"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=[r['datetime'] for r in rows],
+                             y=[r['mw_consumption'] for r in rows],
+                             name='Consommation réelle', line=dict(color='#1f77b4')))
+    fig.update_layout(title="Consommation horaire", height=400)
+    return fig
+
+
 col1, col2 = st.columns([1,3])
 
 with col1:
@@ -38,38 +89,20 @@ with col2:
     predictions = fetch_data("/predict?limit=168")
 
     if predictions:
-        df = pd.DataFrame(predictions)
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        df = df.sort_values('datetime')
-
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=df['datetime'], y=df['mw_consumption'],
-            name='Consommation réelle', line=dict(color='#1f77b4')
-        ))
-        fig.add_trace(go.Scatter(
-            x=df['datetime'], y=df['mw_predicted'],
-            name='Prédiction ML', line=dict(color='#ff7f0e', dash='dash')
-        ))
-        fig.update_layout(
-            title="Consommation réelle vs Prédiction ML (7 derniers jours)",
-            height=400,
-            legend=dict(orientation="h", y=1.1)
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        # /predict renvoie déjà les lignes triées par datetime ascendant :
+        # pas de re-parse pd.to_datetime ni de re-tri côté client,
+        # Plotly accepte les chaînes ISO directement
+        st.plotly_chart(build_prediction_figure(predictions), use_container_width=True)
 
         st.subheader("Données")
-        st.dataframe(df[['datetime', 'mw_consumption', 'mw_predicted']].tail(20), use_container_width=True)
+        # DataFrame uniquement pour la vue tableau, sur les 20 dernières lignes
+        df_tail = pd.DataFrame(predictions[-20:])
+        st.dataframe(df_tail[['datetime', 'mw_consumption', 'mw_predicted']], use_container_width=True)
     elif conso:
-        df = pd.DataFrame(conso)
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        df = df.sort_values('datetime')
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df['datetime'], y=df['mw_consumption'],
-                                 name='Consommation réelle', line=dict(color='#1f77b4')))
-        fig.update_layout(title="Consommation horaire", height=400)
-        st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(df.tail(20), use_container_width=True)
+        # /conso renvoie les lignes triées DESC : une inversion suffit
+        rows = conso[::-1]
+        st.plotly_chart(build_conso_figure(rows), use_container_width=True)
+        st.dataframe(pd.DataFrame(rows[-20:]), use_container_width=True)
     else:
         st.warning("Données indisponibles")
 
@@ -3,7 +3,8 @@ Entraînement du modèle de prédiction avec MLflow tracking
 """
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
@@ -59,8 +60,14 @@ def prepare_features(df):
 
 
 def train_model(X_train, y_train, params):
-    """Entraîner le modèle RandomForest"""
-    model = RandomForestRegressor(**params)
+    """Entraîner le modèle de gradient boosting par histogrammes
+
+    HistGradientBoostingRegressor binne les features en entiers et
+    construit ses histogrammes en C multi-threadé : entraînement et
+    inférence bien plus rapides qu'une forêt de 200 arbres profonds,
+    pour un modèle final beaucoup plus compact.
+    """
+    model = HistGradientBoostingRegressor(**params)
     model.fit(X_train, y_train)
     return model
 
@@ -106,12 +113,11 @@ def main():
 
     # Hyperparamètres
     params = {
-        'n_estimators': 200,
-        'max_depth': 15,
-        'min_samples_split': 5,
-        'min_samples_leaf': 2,
+        'max_iter': 400,
+        'max_depth': 8,
+        'learning_rate': 0.05,
+        'early_stopping': True,
         'random_state': 42,
-        'n_jobs': -1
     }
 
     # MLflow run
@@ -150,10 +156,14 @@ def main():
         mlflow.log_metric("mape_percent", mape)
         print(f"MAPE: {mape:.2f}%")
 
-        # Feature importance
+        # Feature importance (par permutation : le gradient boosting par
+        # histogrammes n'expose pas feature_importances_)
+        perm = permutation_importance(
+            model, X_test, y_test, n_repeats=5, random_state=42
+        )
         feature_importance = pd.DataFrame({
             'feature': X.columns,
-            'importance': model.feature_importances_
+            'importance': perm.importances_mean
         }).sort_values('importance', ascending=False)
 
         print("\nImportance des features:")
@@ -177,7 +187,7 @@ def main():
         )
 
         # Tags
-        mlflow.set_tag("model_type", "RandomForestRegressor")
+        mlflow.set_tag("model_type", "HistGradientBoostingRegressor")
         mlflow.set_tag("target", "consommation_electrique")
         mlflow.set_tag("data_sources", "API_RTE + Fichier_CSV + Web_Scrapping")
         mlflow.set_tag("nb_sources", "3")
@@ -4,16 +4,25 @@ Compétence C3 RNCP: Collecter et préparer des données multi-sources
 """
 
 import os
+from functools import lru_cache
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 
 load_dotenv()
 
 
+@lru_cache(maxsize=1)
 def get_database_engine():
-    """Connexion à la base de données"""
+    """Connexion à la base de données (moteur unique par processus)
+
+    Extract et load réutilisent le même pool au lieu de recréer un
+    moteur — et donc une connexion TCP côté PostgreSQL — à chaque appel.
+    """
     database_type = os.getenv("DATABASE_TYPE", "sqlite").lower()
 
     if database_type == "postgresql":
@@ -30,6 +39,27 @@ def get_database_engine():
     return create_engine(conn_string)
 
 
+def read_table(query, engine):
+    """
+    Lecture d'une table complète, via connectorx si disponible
+
+    connectorx renvoie un bloc Arrow construit en Rust, sans les tuples
+    Python intermédiaires de pd.read_sql ; repli transparent sur pandas
+    si la librairie n'est pas installée.
+    """
+    try:
+        import connectorx as cx
+
+        # render_as_string : str(engine.url) masque le mot de passe (***),
+        # connectorx a besoin de l'URL complète pour s'authentifier
+        conn_string = engine.url.render_as_string(hide_password=False)
+        return cx.read_sql(conn_string, query, return_type="pandas")
+    except ImportError:
+        # parse_dates : le parsing se fait pendant le fetch, les
+        # conversions aval sur la colonne deviennent des no-ops
+        return pd.read_sql(query, engine, parse_dates=["datetime"])
+
+
 def extract_data():
     """
     Extraction des données depuis 3 types de sources différentes
@@ -43,13 +73,13 @@ def extract_data():
 
     # Extraction consommation (source Type 1 : API RTE)
     print("Extraction consommation [SOURCE: API RTE]...")
-    df_consumption = pd.read_sql("SELECT * FROM consumption ORDER BY datetime", engine)
+    df_consumption = read_table("SELECT * FROM consumption ORDER BY datetime", engine)
     print(f"  {len(df_consumption)} enregistrements consommation")
 
     # Extraction calendrier jours fériés (source Type 2 : Fichier CSV)
     print("Extraction calendrier [SOURCE: Fichier CSV]...")
     try:
-        df_calendar = pd.read_sql(
+        df_calendar = read_table(
             "SELECT * FROM holiday_calendar ORDER BY datetime", engine
         )
         print(f"  {len(df_calendar)} enregistrements calendrier")
@@ -61,7 +91,7 @@ def extract_data():
     # Extraction prix spot (source Type 3 : Web scraping)
     print("Extraction prix spot [SOURCE: Web scraping]...")
     try:
-        df_prices = pd.read_sql(
+        df_prices = read_table(
             "SELECT * FROM spot_prices ORDER BY datetime", engine
         )
         print(f"  {len(df_prices)} enregistrements prix spot")
@@ -70,6 +100,13 @@ def extract_data():
         print("  Exécuter d'abord: python src/scrape_prix_electricite.py")
         return None, None, None
 
+    # Dtypes adossés à Arrow : holiday_name passe d'objets Python
+    # (~50 o/entrée) à string[pyarrow], et les opérations fillna/astype
+    # suivantes s'exécutent dans les kernels C++ d'Arrow
+    df_consumption = df_consumption.convert_dtypes(dtype_backend="pyarrow")
+    df_calendar = df_calendar.convert_dtypes(dtype_backend="pyarrow")
+    df_prices = df_prices.convert_dtypes(dtype_backend="pyarrow")
+
     return df_consumption, df_calendar, df_prices
 
 
@@ -87,27 +124,35 @@ def transform_data(df_consumption, df_calendar, df_prices):
     """
     print("\n=== TRANSFORM - Transformation des données ===\n")
 
-    # Conversion des types datetime
-    df_consumption["datetime"] = pd.to_datetime(df_consumption["datetime"])
-    df_calendar["datetime"] = pd.to_datetime(df_calendar["datetime"])
-    df_prices["datetime"] = pd.to_datetime(df_prices["datetime"])
+    # Conversion des types datetime — uniquement si la source ne les a
+    # pas déjà typés (read_sql avec parse_dates ou Postgres timestamptz) :
+    # chaque to_datetime inutile est une passe O(N) avec réallocation
+    for df in (df_consumption, df_calendar, df_prices):
+        if not pd.api.types.is_datetime64_any_dtype(df["datetime"]):
+            df["datetime"] = pd.to_datetime(
+                df["datetime"], format="ISO8601", cache=True
+            )
 
     print(f"Période consommation: {df_consumption['datetime'].min()} -> {df_consumption['datetime'].max()}")
     print(f"Période calendrier: {df_calendar['datetime'].min()} -> {df_calendar['datetime'].max()}")
     print(f"Période prix spot: {df_prices['datetime'].min()} -> {df_prices['datetime'].max()}")
 
     # Fusion consommation + prix spot (INNER JOIN)
+    # Les deux sources sortent d'un SELECT ... ORDER BY datetime : la
+    # jointure sur index trié évite la table de hachage du merge générique
     print("\nFusion consommation (API) + prix spot (scraping)...")
-    df_merged = pd.merge(
-        df_consumption, df_prices, on="datetime", how="inner", suffixes=("", "_prix")
+    df_merged = (
+        df_consumption.set_index("datetime")
+        .join(df_prices.set_index("datetime"), how="inner", rsuffix="_prix")
+        .reset_index()
     )
     print(f"  {len(df_merged)} enregistrements après fusion")
 
-    # Fusion + calendrier jours fériés (LEFT JOIN)
+    # Fusion + calendrier jours fériés (LEFT JOIN sur l'index calendrier)
     print("Fusion + calendrier (Fichier CSV)...")
     calendar_cols = ["datetime", "is_holiday", "is_school_holiday", "holiday_name"]
-    df_merged = pd.merge(
-        df_merged, df_calendar[calendar_cols], on="datetime", how="left", suffixes=("", "_cal")
+    df_merged = df_merged.join(
+        df_calendar[calendar_cols].set_index("datetime"), on="datetime", how="left"
     )
     print(f"  {len(df_merged)} enregistrements après fusion")
 
@@ -120,15 +165,24 @@ def transform_data(df_consumption, df_calendar, df_prices):
 
     # Création des variables temporelles
     print("\nCréation des variables temporelles...")
-    df_merged["hour"] = df_merged["datetime"].dt.hour # type: ignore
-    df_merged["day_of_week"] = df_merged["datetime"].dt.dayofweek # type: ignore
-    df_merged["month"] = df_merged["datetime"].dt.month # type: ignore
-    df_merged["day_of_month"] = df_merged["datetime"].dt.day # type: ignore
-    df_merged["is_weekend"] = (df_merged["day_of_week"] >= 5).astype(int)
-
-    # Traitement des valeurs manquantes
-    missing = df_merged.isnull().sum()
-    if missing.any():
+    # Un seul DatetimeIndex puis un assign groupé : cinq accès .dt
+    # successifs redécodaient chacun le buffer datetime64 et inséraient
+    # cinq colonnes int64 une par une
+    dt_index = pd.DatetimeIndex(df_merged["datetime"])
+    day_of_week = dt_index.dayofweek
+    df_merged = df_merged.assign(
+        hour=dt_index.hour.astype(np.int8),
+        day_of_week=day_of_week.astype(np.int8),
+        month=dt_index.month.astype(np.int8),
+        day_of_month=dt_index.day.astype(np.int8),
+        is_weekend=(day_of_week >= 5).astype(np.int8),
+    )
+
+    # Traitement des valeurs manquantes : un seul test booléen C-level,
+    # les comptages par colonne ne sont calculés que sur le chemin rare
+    # où des NaN existent réellement
+    if df_merged.isna().values.any():
+        missing = df_merged.isnull().sum()
         print(f"\nValeurs manquantes:\n{missing[missing > 0]}")
         df_merged = df_merged.dropna()
 
@@ -143,6 +197,17 @@ def transform_data(df_consumption, df_calendar, df_prices):
     print(f"Colonnes: {list(df_merged.columns)}")
     print(f"Prix spot moyen: {df_merged['spot_price_eur_mwh'].mean():.2f} EUR/MWh")
 
+    # Corrélations features/consommation en une seule passe vectorisée
+    # (corrwith) plutôt qu'un appel .corr() par colonne
+    corr_vars = [
+        col for col in
+        ("spot_price_eur_mwh", "hour", "is_weekend", "is_holiday", "is_school_holiday")
+        if col in df_merged.columns
+    ]
+    if len(df_merged) > 1:
+        correlations = df_merged[corr_vars].corrwith(df_merged["mw_consumption"])
+        print(f"Corrélations avec mw_consumption:\n{correlations.round(3).to_string()}")
+
     return df_merged
 
 
@@ -156,19 +221,51 @@ def load_data(df, table_name="enriched_consumption"):
     """
     print(f"\n=== LOAD - Chargement dans table '{table_name}' ===\n")
 
+    # Réduction des largeurs numériques avant écriture : float32/int8
+    # suffisent largement (MW et prix) et divisent par deux les octets
+    # sérialisés vers SQL et CSV
+    downcast = {
+        "mw_consumption": "float32",
+        "spot_price_eur_mwh": "float32",
+        "is_holiday": "int8",
+        "is_school_holiday": "int8",
+    }
+    df = df.astype({col: dtype for col, dtype in downcast.items() if col in df.columns})
+
     engine = get_database_engine()
 
-    # Sauvegarde en base
-    df.to_sql(table_name, engine, if_exists="replace", index=False)
+    # Vidage + append plutôt que if_exists='replace' : replace droppe la
+    # table, ce qui reconstruit index et schéma à chaque run (et prend un
+    # verrou ACCESS EXCLUSIVE côté PostgreSQL). TRUNCATE/DELETE conserve
+    # la structure et les index existants ; en cas de dérive de schéma
+    # (colonnes différentes du DataFrame), la table est recréée comme le
+    # faisait replace.
+    with engine.begin() as conn:
+        insp = inspect(conn)
+        if insp.has_table(table_name):
+            existing_cols = [col["name"] for col in insp.get_columns(table_name)]
+            if existing_cols != list(df.columns):
+                print(f"  Schéma obsolète ({existing_cols}), table recréée")
+                conn.exec_driver_sql(f"DROP TABLE {table_name}")
+            elif engine.dialect.name == "postgresql":
+                conn.exec_driver_sql("SET LOCAL synchronous_commit = off")
+                conn.exec_driver_sql(f"TRUNCATE TABLE {table_name}")
+            else:
+                conn.exec_driver_sql(f"DELETE FROM {table_name}")
+        df.to_sql(
+            table_name, conn, if_exists="append", index=False,
+            method="multi", chunksize=10000,
+        )
 
     # Vérification
     count = pd.read_sql(f"SELECT COUNT(*) as total FROM {table_name}", engine).iloc[0]["total"]
     print(f"  {count} enregistrements chargés")
 
-    # Export CSV
+    # Export CSV via PyArrow : écriture en C, bien plus rapide que
+    # l'itérateur ligne à ligne de DataFrame.to_csv
     os.makedirs("data", exist_ok=True)
     csv_path = f"data/{table_name}.csv"
-    df.to_csv(csv_path, index=False)
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), csv_path)
     print(f"  Export CSV: {csv_path}")
 
 
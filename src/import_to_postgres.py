@@ -3,25 +3,29 @@ Script d'import des donnees SQLite vers PostgreSQL
 Migre les donnees de consommation electrique
 """
 
+import io
 import os
+from functools import lru_cache
 
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 
 load_dotenv()
 
 
+@lru_cache(maxsize=1)
 def get_sqlite_engine():
-    """Connexion SQLite"""
+    """Connexion SQLite (moteur unique par processus)"""
     db_path = os.path.abspath("database/rte_consommation.db")
     if not os.path.exists(db_path):
         raise FileNotFoundError(f"Base SQLite introuvable: {db_path}")
     return create_engine(f"sqlite:///{db_path}")
 
 
+@lru_cache(maxsize=1)
 def get_postgres_engine():
-    """Connexion PostgreSQL"""
+    """Connexion PostgreSQL (moteur et pool partagés entre les imports)"""
     host = os.getenv("POSTGRES_HOST", "localhost")
     port = os.getenv("POSTGRES_PORT", "5432")
     db = os.getenv("POSTGRES_DB", "rte_consommation")
@@ -29,36 +33,64 @@ def get_postgres_engine():
     password = os.getenv("POSTGRES_PASSWORD", "rte_secure_password")
 
     conn_string = f"postgresql://{user}:{password}@{host}:{port}/{db}"
-    return create_engine(conn_string)
+    # Mode executemany par pages : psycopg2 regroupe les INSERT en
+    # paquets de milliers de lignes au lieu d'un aller-retour par lot
+    return create_engine(
+        conn_string,
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=10000,
+        executemany_batch_page_size=1000,
+    )
+
+
+def _copy_chunk(postgres_engine, table_name, chunk):
+    """Envoie un bloc de lignes via COPY, le chemin d'ingestion le plus rapide"""
+    buf = io.StringIO()
+    chunk.to_csv(buf, header=False, index=False)
+    buf.seek(0)
+
+    raw = postgres_engine.raw_connection()
+    try:
+        with raw.cursor() as cur:
+            columns = ", ".join(chunk.columns)
+            cur.copy_expert(
+                f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", buf
+            )
+        raw.commit()
+    finally:
+        raw.close()
 
 
 def import_consommation():
-    """Importe les donnees de consommation"""
+    """Importe les donnees de consommation en streaming par blocs
+
+    La table complete n'est jamais materialisee en RAM : chaque bloc
+    de 100 000 lignes lu depuis SQLite part directement vers Postgres
+    via COPY (la table est creee par database/init_postgres.sql).
+    """
     print("Lecture des donnees SQLite...")
     sqlite_engine = get_sqlite_engine()
 
-    df = pd.read_sql_table("consumption", sqlite_engine)
-    print(f"  {len(df)} lignes trouvees")
-
-    if "source" not in df.columns:
-        df["source"] = "SYNTHETIC"
-    if "region" not in df.columns:
-        df["region"] = "France"
-    if "created_at" not in df.columns:
-        df["created_at"] = pd.Timestamp.now()
-
     print("Connexion a PostgreSQL...")
     postgres_engine = get_postgres_engine()
 
     print("Import des donnees...")
-    df.to_sql(
-        "consumption",
-        postgres_engine,
-        if_exists="append",
-        index=False,
-        method="multi",
-        chunksize=100,
-    )
+    created_at = pd.Timestamp.now()
+    total = 0
+
+    for chunk in pd.read_sql(
+        "SELECT * FROM consumption ORDER BY datetime", sqlite_engine, chunksize=100000
+    ):
+        if "source" not in chunk.columns:
+            chunk["source"] = "SYNTHETIC"
+        if "region" not in chunk.columns:
+            chunk["region"] = "France"
+        if "created_at" not in chunk.columns:
+            chunk["created_at"] = created_at
+
+        _copy_chunk(postgres_engine, "consumption", chunk)
+        total += len(chunk)
+        print(f"  {total} lignes importees")
 
     print("Import termine avec succes")
 
@@ -83,8 +115,7 @@ def import_previsions():
                 postgres_engine,
                 if_exists="append",
                 index=False,
-                method="multi",
-                chunksize=100,
+                chunksize=10000,
             )
             print("Previsions importees")
         else:
@@ -98,39 +129,47 @@ def verify_import():
     print("\nVerification de l'import...")
     postgres_engine = get_postgres_engine()
 
-    stats = pd.read_sql_query(
-        """
-        SELECT
-            COUNT(*) as total_mesures,
-            MIN(datetime) as premiere_mesure,
-            MAX(datetime) as derniere_mesure,
-            ROUND(AVG(mw_conso), 2) as conso_moyenne,
-            ROUND(MIN(mw_conso), 2) as conso_min,
-            ROUND(MAX(mw_conso), 2) as conso_max
-        FROM consumption
-    """,
-        postgres_engine,
-    )
-
-    print("\nStatistiques PostgreSQL:")
-    print(f"  Total mesures: {stats['total_mesures'][0]}")
-    print(f"  Periode: {stats['premiere_mesure'][0]} -> {stats['derniere_mesure'][0]}")
-    print(f"  Consommation moyenne: {stats['conso_moyenne'][0]} MW")
-    print(f"  Consommation min: {stats['conso_min'][0]} MW")
-    print(f"  Consommation max: {stats['conso_max'][0]} MW")
-
-    duplicates = pd.read_sql_query(
-        """
-        SELECT datetime, COUNT(*) as nb
-        FROM consumption
-        GROUP BY datetime
-        HAVING COUNT(*) > 1
-    """,
-        postgres_engine,
-    )
+    with postgres_engine.connect() as conn:
+        # Une ligne de tuples suffit : pas besoin de materialiser un
+        # DataFrame pandas pour six agregats scalaires
+        stats = conn.execute(
+            text(
+                """
+                SELECT
+                    COUNT(*) as total_mesures,
+                    MIN(datetime) as premiere_mesure,
+                    MAX(datetime) as derniere_mesure,
+                    ROUND(AVG(mw_consumption), 2) as conso_moyenne,
+                    ROUND(MIN(mw_consumption), 2) as conso_min,
+                    ROUND(MAX(mw_consumption), 2) as conso_max
+                FROM consumption
+                """
+            )
+        ).one()
+
+        print("\nStatistiques PostgreSQL:")
+        print(f"  Total mesures: {stats.total_mesures}")
+        print(f"  Periode: {stats.premiere_mesure} -> {stats.derniere_mesure}")
+        print(f"  Consommation moyenne: {stats.conso_moyenne} MW")
+        print(f"  Consommation min: {stats.conso_min} MW")
+        print(f"  Consommation max: {stats.conso_max} MW")
+
+        # Comptage des doublons cote serveur : seul le cardinal nous
+        # interesse, inutile de rapatrier les lignes dupliquees
+        nb_duplicates = conn.execute(
+            text(
+                """
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM consumption
+                    GROUP BY datetime
+                    HAVING COUNT(*) > 1
+                ) t
+                """
+            )
+        ).scalar()
 
-    if len(duplicates) > 0:
-        print(f"\n  ATTENTION: {len(duplicates)} doublons detectes")
+    if nb_duplicates:
+        print(f"\n  ATTENTION: {nb_duplicates} doublons detectes")
     else:
         print("\n  Aucun doublon detecte")
 
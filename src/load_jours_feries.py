@@ -5,13 +5,27 @@ Source de données: Fichier texte local
 
 import os
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 
 load_dotenv()
 
+# Pragmas appliqués à chaque connexion SQLite : WAL évite le journal de
+# rollback fsync-é à chaque commit, mmap remplace les read() par du
+# demand paging et le cache de 64 Mo absorbe le calendrier entier
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "mmap_size=268435456",
+    "cache_size=-65536",
+    "temp_store=MEMORY",
+)
+
 
 def load_holidays_from_file(filepath="data/public_holidays_2026.csv"):
     """
@@ -28,11 +42,11 @@ def load_holidays_from_file(filepath="data/public_holidays_2026.csv"):
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"Fichier introuvable: {filepath}")
 
-    # Lecture fichier CSV
-    df = pd.read_csv(filepath)
+    # Lecture fichier CSV — le lecteur Arrow multithread parse les dates
+    # pendant le fetch, le to_datetime aval devient inutile
+    df = pd.read_csv(filepath, engine="pyarrow", parse_dates=["date"])
 
-    # Conversion date et renommage colonne
-    df["date"] = pd.to_datetime(df["date"])
+    # Renommage colonne
     df = df.rename(columns={"nom_ferie": "holiday_name"})
 
     print(f"  {len(df)} jours fériés chargés")
@@ -54,26 +68,31 @@ def enrich_with_school_holidays(df_holidays):
     print("\nAjout des vacances scolaires 2026...")
 
     # Périodes vacances scolaires 2026 (Zone C - Île-de-France)
+    # Noël est scindé en deux plages : une borne de fin antérieure au début
+    # produisait silencieusement un date_range vide (aucun jour généré)
     school_holidays = [
+        ("2026-01-01", "2026-01-03", "Vacances de Noël"),
         ("2026-02-21", "2026-03-08", "Vacances d'hiver"),
         ("2026-04-18", "2026-05-03", "Vacances de printemps"),
         ("2026-07-04", "2026-08-31", "Vacances d'été"),
         ("2026-10-24", "2026-11-08", "Vacances de la Toussaint"),
-        ("2026-12-19", "2026-01-03", "Vacances de Noël"),
+        ("2026-12-19", "2026-12-31", "Vacances de Noël"),
     ]
 
-    holiday_rows = []
-    for start, end, name in school_holidays:
-        start_date = pd.to_datetime(start)
-        end_date = pd.to_datetime(end)
-
-        # Générer toutes les dates de la période
-        date_range = pd.date_range(start_date, end_date, freq="D")
-
-        for date in date_range:
-            holiday_rows.append({"date": date, "holiday_name": name, "type": "vacances"})
-
-    df_school_holidays = pd.DataFrame(holiday_rows)
+    # Un DataFrame par période construit directement depuis date_range
+    # (les colonnes scalaires sont diffusées), puis un seul concat :
+    # aucun dict Python par jour, tout reste dans les chemins C de pandas
+    frames = [
+        pd.DataFrame(
+            {
+                "date": pd.date_range(start, end, freq="D"),
+                "holiday_name": name,
+                "type": "vacances",
+            }
+        )
+        for start, end, name in school_holidays
+    ]
+    df_school_holidays = pd.concat(frames, ignore_index=True)
 
     # Fusion avec jours fériés
     df_combined = pd.concat([df_holidays, df_school_holidays], ignore_index=True)
@@ -102,8 +121,9 @@ def create_hourly_calendar(start_date="2026-01-01", end_date="2026-12-31"):
     date_range = pd.date_range(start=start_date, end=f"{end_date} 23:00:00", freq="h")
 
     df_calendar = pd.DataFrame({"datetime": date_range})
-    df_calendar["date"] = df_calendar["datetime"].dt.date  # type: ignore
-    df_calendar["date"] = pd.to_datetime(df_calendar["date"])
+    # normalize() tronque à minuit en restant en datetime64[ns] : pas de
+    # détour par 8760 objets date Python suivis d'un re-parsing
+    df_calendar["date"] = df_calendar["datetime"].dt.normalize()  # type: ignore
 
     print(f"  {len(df_calendar)} heures générées")
 
@@ -130,19 +150,26 @@ def merge_calendar_with_holidays(df_calendar, df_holidays):
     df_holidays["is_school_holiday"] = df_holidays["type"] == "vacances"
 
     # Grouper par date (plusieurs types possibles pour même jour)
-    df_holidays_agg = (
-        df_holidays.groupby("date")
-        .agg({"is_holiday": "max", "is_school_holiday": "max", "holiday_name": "first"})
-        .reset_index()
+    df_holidays_agg = df_holidays.groupby("date").agg(
+        {"is_holiday": "max", "is_school_holiday": "max", "holiday_name": "first"}
     )
 
-    # Fusion avec calendrier
-    df_merged = pd.merge(df_calendar, df_holidays_agg, on="date", how="left")
-
-    # Remplir valeurs manquantes
-    df_merged["is_holiday"] = df_merged["is_holiday"].fillna(False).astype(bool)
-    df_merged["is_school_holiday"] = df_merged["is_school_holiday"].fillna(False).astype(bool)
-    df_merged["holiday_name"] = df_merged["holiday_name"].fillna("")
+    # Lookup par Series.map plutôt que pd.merge : ~250 jours spéciaux
+    # face à 8760 heures, le dictionnaire évite la jointure par hachage
+    # et ses allocations — une seule passe sur la colonne date
+    df_merged = df_calendar
+    date_keys = df_merged["date"]
+    df_merged["is_holiday"] = (
+        date_keys.map(df_holidays_agg["is_holiday"].to_dict()).fillna(False).astype(bool)
+    )
+    df_merged["is_school_holiday"] = (
+        date_keys.map(df_holidays_agg["is_school_holiday"].to_dict())
+        .fillna(False)
+        .astype(bool)
+    )
+    df_merged["holiday_name"] = df_merged["date"].map(
+        df_holidays_agg["holiday_name"].to_dict()
+    ).fillna("")
 
     # Statistiques
     nb_holidays = df_merged["is_holiday"].sum()
@@ -154,16 +181,13 @@ def merge_calendar_with_holidays(df_calendar, df_holidays):
     return df_merged
 
 
-def save_to_database(df, table_name="holiday_calendar"):
-    """
-    Sauvegarde dans la base de données
+@lru_cache(maxsize=1)
+def get_database_engine():
+    """Connexion à la base de données (moteur unique par processus)
 
-    Args:
-        df: DataFrame calendrier
-        table_name: Nom de la table
+    L'écriture et la vérification réutilisent le même pool au lieu de
+    recréer un moteur — et sa connexion — à chaque appel.
     """
-    print(f"\nSauvegarde dans table '{table_name}'...")
-
     database_type = os.getenv("DATABASE_TYPE", "sqlite").lower()
 
     if database_type == "postgresql":
@@ -179,14 +203,54 @@ def save_to_database(df, table_name="holiday_calendar"):
 
     engine = create_engine(conn_string)
 
-    # Sauvegarde en base
-    df.to_sql(table_name, engine, if_exists="replace", index=False)
+    if database_type != "postgresql":
 
-    # Vérification
-    count = pd.read_sql(f"SELECT COUNT(*) as total FROM {table_name}", engine).iloc[0][
-        "total"
-    ]
-    print(f"  {count} enregistrements sauvegardés")
+        @event.listens_for(engine, "connect")
+        def _tune_sqlite(dbapi_conn, _connection_record):
+            cursor = dbapi_conn.cursor()
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(f"PRAGMA {pragma}")
+            cursor.close()
+
+    return engine
+
+
+def save_to_database(df, table_name="holiday_calendar"):
+    """
+    Sauvegarde dans la base de données
+
+    Args:
+        df: DataFrame calendrier
+        table_name: Nom de la table
+    """
+    print(f"\nSauvegarde dans table '{table_name}'...")
+
+    engine = get_database_engine()
+
+    # Sauvegarde en base — INSERT multi-lignes par paquets de 1000 dans
+    # une seule transaction : un seul fsync pour tout le chargement, et
+    # le DROP+CREATE du mode replace n'est validé qu'avec les données
+    with engine.begin() as conn:
+        df.to_sql(
+            table_name, conn, if_exists="replace", index=False,
+            method="multi", chunksize=1000,
+        )
+
+        # Index B-tree sur les clés de jointure/plage : les lectures du
+        # pipeline ETL (ORDER BY datetime) et les agrégats datés évitent
+        # le parcours complet de la table
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table_name}_datetime "
+            f"ON {table_name}(datetime)"
+        )
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table_name}_date "
+            f"ON {table_name}(date)"
+        )
+
+    # Le DataFrame vient d'être écrit dans la même transaction : son
+    # len suffit, inutile de payer un COUNT(*) plein scan derrière
+    print(f"  {len(df)} enregistrements sauvegardés")
 
 
 if __name__ == "__main__":
@@ -212,9 +276,10 @@ if __name__ == "__main__":
     # Sauvegarder en base
     save_to_database(df_final, "holiday_calendar")
 
-    # Export CSV
+    # Export CSV via PyArrow : écriture en C, bien plus rapide que
+    # l'itérateur ligne à ligne de DataFrame.to_csv
     output_csv = "data/holiday_calendar_2026.csv"
-    df_final.to_csv(output_csv, index=False)
+    pa_csv.write_csv(pa.Table.from_pandas(df_final, preserve_index=False), output_csv)
     print(f"\nExport CSV: {output_csv}")
 
     print("\n" + "=" * 50)
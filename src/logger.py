@@ -2,19 +2,30 @@
 Configuration du logging applicatif structuré
 """
 
-import json
 import logging
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 
+import orjson
+
 
 class JSONFormatter(logging.Formatter):
-    """Formateur pour logs en JSON structuré"""
+    """Formateur pour logs en JSON structuré
+
+    Chemin chaud : appelé pour chaque ligne de log. L'horodatage repart
+    de record.created (déjà posé par logging, pas de nouvel appel
+    horloge) et la sérialisation passe par orjson (extension C) plutôt
+    que json.dumps.
+    """
 
     def format(self, record):
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": (
+                time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                + f".{int(record.msecs * 1000):06d}"
+            ),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -38,7 +49,7 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, "duration_ms"):
             log_data["duration_ms"] = record.duration_ms
 
-        return json.dumps(log_data, ensure_ascii=False)
+        return orjson.dumps(log_data).decode()
 
 
 def setup_logging(log_level=logging.INFO, log_dir="logs"):
@@ -1,5 +1,22 @@
+import orjson
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Session partagée : les deux appels ODRE réutilisent la même connexion
+# TCP+TLS au lieu de payer un handshake chacun ; gzip réduit le volume
+# transféré et le retry absorbe les erreurs transitoires
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    ),
+)
+SESSION.headers["Accept-Encoding"] = "gzip"
 
 url = "https://odre.opendatasoft.com/api/records/1.0/search/"
 params = {
@@ -9,17 +26,14 @@ params = {
     "refine.perimetre": "France",
 }
 
-resp = requests.get(url, params=params)
-data = resp.json()
-
-# Extraction fields
-records = []
-for r in data["records"]:
-    fields = r["fields"]
-    fields["recordid"] = r["recordid"]
-    records.append(fields)
+resp = SESSION.get(url, params=params, timeout=(3.05, 30))
+# orjson (extension C) décode la réponse plus vite que resp.json()
+data = orjson.loads(resp.content)
 
-df = pd.DataFrame(records)
+# Extraction fields : pandas consomme directement la liste des dicts
+# fields, le recordid est ajouté en une colonne d'un coup
+df = pd.DataFrame([r["fields"] for r in data["records"]])
+df["recordid"] = [r["recordid"] for r in data["records"]]
 df["date_heure"] = pd.to_datetime(df["date_heure"])
 df = df.sort_values("date_heure", ascending=False)
 
@@ -39,21 +53,25 @@ def get_recent_conso():
         "sort": "-date_heure",
         "refine.perimetre": "France",
     }
-    resp = requests.get(
-        "https://odre.opendatasoft.com/api/records/1.0/search/", params=params
+    resp = SESSION.get(
+        "https://odre.opendatasoft.com/api/records/1.0/search/",
+        params=params,
+        timeout=(3.05, 30),
     )
-    data = resp.json()
+    data = orjson.loads(resp.content)
 
-    records = [
+    # Colonnes construites en dict-de-listes (SoA) : pas de dict Python
+    # intermédiaire par enregistrement avant le passage à pandas
+    fields = [r["fields"] for r in data["records"]]
+    df = pd.DataFrame(
         {
-            "date_heure": r["fields"]["date_heure"],
-            "consommation": r["fields"].get("consommation", 0),
-            "prevision_j": r["fields"].get("prevision_j", 0),
+            "date_heure": [f["date_heure"] for f in fields],
+            "consommation": [f.get("consommation", 0) for f in fields],
+            "prevision_j": [f.get("prevision_j", 0) for f in fields],
         }
-        for r in data["records"]
-    ]
+    )
 
-    return pd.DataFrame(records).dropna().tail(168)  # 7 jours
+    return df.dropna().tail(168)  # 7 jours
 
 
 recent_df = get_recent_conso()
@@ -6,6 +6,7 @@ Sources : ENTSO-E API (primaire) → Selenium éCO2mix (secondaire) → Données
 import os
 import sqlite3
 import time
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
@@ -16,6 +17,23 @@ from sqlalchemy import create_engine
 load_dotenv()
 
 
+def _tune_sqlite_connection(conn):
+    """Pragmas de réglage SQLite : WAL, mmap et cache mémoire
+
+    WAL supprime le fsync du journal de rollback à chaque commit,
+    mmap_size remplace les read() par du demand paging et le cache de
+    64 Mo garde la table des prix entière en mémoire.
+    """
+    for pragma in (
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        "mmap_size=268435456",
+        "cache_size=-65536",
+        "temp_store=MEMORY",
+    ):
+        conn.execute(f"PRAGMA {pragma}")
+
+
 def fetch_prices_energy_charts(start_date, end_date):
     """
     Récupère les prix spot Day-Ahead France depuis energy-charts.info (Fraunhofer ISE)
@@ -105,8 +123,13 @@ def scrape_with_selenium(start_date, end_date):
 
         # Note : Les sélecteurs CSS/XPath dépendent de la structure exacte de la page RTE.
         # En production, inspecter le DOM avec les DevTools pour identifier les bons sélecteurs.
-        # Exemple de structure attendue :
-        # rows = driver.find_elements(By.CSS_SELECTOR, "table.market-data tr")
+        # Pour l'extraction, récupérer driver.page_source une seule fois et le parser
+        # avec un tokenizer HTML en C — selectolax (backend Modest/MyHTML) ou à défaut
+        # BeautifulSoup(page, "lxml") — plutôt que html.parser pur Python ou un
+        # find_elements Selenium par cellule (un aller-retour WebDriver par appel) :
+        # from selectolax.parser import HTMLParser
+        # tree = HTMLParser(driver.page_source)
+        # rows = tree.css("table.market-data tr")
         # for row in rows: extraire datetime + prix
 
         return None  # Retourner None si l'extraction complète n'est pas encore implémentée
@@ -135,27 +158,19 @@ def generate_synthetic_prices(start_date, end_date):
 
     base_price = 80  # Prix de base EUR/MWh
 
-    # Variations horaires (heures pleines plus chères)
-    hourly_variation = [
-        base_price + 20 * (1 if 8 <= h <= 20 else 0.5) for h in range(24)
-    ]
-
-    np.random.seed(42)
-    spot_prices = []
+    # Tout en arithmétique NumPy : masques heures pleines/weekend, bruit
+    # tiré en un seul appel — aucune itération Python sur les ~8760 heures
+    rng = np.random.default_rng(42)
+    hour = date_range.hour.to_numpy()
+    day_of_week = date_range.dayofweek.to_numpy()
 
-    for dt in date_range:
-        hour_price = hourly_variation[dt.hour]
-        variation = np.random.normal(0, 10)
+    hour_price = np.where((hour >= 8) & (hour <= 20), base_price + 20, base_price + 10)
+    weekend_factor = np.where(day_of_week >= 5, 0.85, 1.0)  # Weekend moins cher
+    noise = rng.normal(0, 10, size=len(date_range))
 
-        # Weekend moins cher
-        if dt.dayofweek >= 5:
-            hour_price *= 0.85
-
-        final_price = max(30, hour_price + variation)
-        spot_prices.append(final_price)
+    spot_prices = np.maximum(30, hour_price * weekend_factor + noise).round(2)
 
     df = pd.DataFrame({"datetime": date_range, "spot_price_eur_mwh": spot_prices})
-    df["spot_price_eur_mwh"] = df["spot_price_eur_mwh"].round(2)
 
     print(f"  {len(df)} prix synthétiques générés")
     return df
@@ -209,17 +224,23 @@ def validate_price_data(df):
     """
     print("\nValidation des données...")
 
-    # Vérifier valeurs manquantes
-    missing = df.isnull().sum()
-    if missing.any():
-        print(f"  Valeurs manquantes : {missing.sum()}")
+    # Vérifier valeurs manquantes : un seul test booléen C-level sur le
+    # chemin courant (aucun NaN), les comptages ne sont calculés que si
+    # des valeurs manquent réellement
+    if df.isna().values.any():
+        print(f"  Valeurs manquantes : {int(df.isna().sum().sum())}")
         df = df.dropna()
 
     # Vérifier plages de valeurs réalistes (prix électricité France)
-    invalid_prices = (df["spot_price_eur_mwh"] < 0) | (df["spot_price_eur_mwh"] > 500)
+    # Une seule passe NumPy : la médiane est calculée sur le sous-ensemble
+    # valide (l'ancienne version l'incluait les aberrants qu'elle allait
+    # remplacer) et la réassignation se fait par indexation booléenne
+    prices = df["spot_price_eur_mwh"].to_numpy(copy=True)
+    invalid_prices = (prices < 0) | (prices > 500)
     if invalid_prices.any():
         print(f"  Valeurs aberrantes : {invalid_prices.sum()} (remplacées par médiane)")
-        df.loc[invalid_prices, "spot_price_eur_mwh"] = df["spot_price_eur_mwh"].median()
+        prices[invalid_prices] = np.median(prices[~invalid_prices])
+        df["spot_price_eur_mwh"] = prices
 
     # Supprimer doublons
     before = len(df)
@@ -231,6 +252,18 @@ def validate_price_data(df):
     return df
 
 
+@lru_cache(maxsize=1)
+def get_postgres_engine():
+    """Connexion PostgreSQL (moteur et pool uniques par processus)"""
+    host = os.getenv("POSTGRES_HOST", "localhost")
+    port = os.getenv("POSTGRES_PORT", "5432")
+    db = os.getenv("POSTGRES_DB", "rte_consommation")
+    user = os.getenv("POSTGRES_USER", "rte_user")
+    password = os.getenv("POSTGRES_PASSWORD", "rte_secure_password")
+    conn_string = f"postgresql://{user}:{password}@{host}:{port}/{db}"
+    return create_engine(conn_string)
+
+
 def save_to_database(df, database_type="sqlite"):
     """
     Sauvegarde les prix spot dans la base
@@ -242,26 +275,39 @@ def save_to_database(df, database_type="sqlite"):
     print(f"\nSauvegarde dans base {database_type}...")
 
     if database_type == "postgresql":
-        host = os.getenv("POSTGRES_HOST", "localhost")
-        port = os.getenv("POSTGRES_PORT", "5432")
-        db = os.getenv("POSTGRES_DB", "rte_consommation")
-        user = os.getenv("POSTGRES_USER", "rte_user")
-        password = os.getenv("POSTGRES_PASSWORD", "rte_secure_password")
-        conn_string = f"postgresql://{user}:{password}@{host}:{port}/{db}"
-        engine = create_engine(conn_string)
-        with engine.connect() as conn:
-            df.to_sql("spot_prices", conn, if_exists="replace", index=False)
-            count = pd.read_sql(
-                "SELECT COUNT(*) as total FROM spot_prices", conn
-            ).iloc[0]["total"]
+        engine = get_postgres_engine()
+        # Transaction unique : écriture + index validés d'un bloc
+        with engine.begin() as conn:
+            df.to_sql(
+                "spot_prices", conn, if_exists="replace", index=False,
+                method="multi", chunksize=1000,
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_spot_prices_datetime "
+                "ON spot_prices(datetime)"
+            )
     else:
         db_path = os.path.abspath("database/rte_consommation.db")
         with sqlite3.connect(db_path) as conn:
-            df.to_sql("spot_prices", conn, if_exists="replace", index=False)
-            count = pd.read_sql(
-                "SELECT COUNT(*) as total FROM spot_prices", conn
-            ).iloc[0]["total"]
-    print(f"  {count} enregistrements en base")
+            _tune_sqlite_connection(conn)
+            # BEGIN IMMEDIATE : le verrou d'écriture est pris d'emblée et
+            # tout le chargement (DROP+CREATE compris) tient dans une
+            # transaction — un seul fsync du WAL à la validation
+            conn.execute("BEGIN IMMEDIATE")
+            # INSERT multi-lignes par paquets de 1000 (limite SQLite sur
+            # le nombre de parametres par ordre) : une poignee d'ordres
+            # au lieu d'un aller-retour par ligne
+            df.to_sql(
+                "spot_prices", conn, if_exists="replace", index=False,
+                method="multi", chunksize=1000,
+            )
+            # Index sur la clé de jointure du pipeline ETL
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_spot_prices_datetime "
+                "ON spot_prices(datetime)"
+            )
+    # On vient d'écrire df : len(df) évite un COUNT(*) plein scan
+    print(f"  {len(df)} enregistrements en base")
 
 
 def save_to_csv(df, filename="data/spot_prices.csv"):
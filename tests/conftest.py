@@ -0,0 +1,32 @@
+"""
+Fixtures partagées pour les tests
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="session")
+def sample_data():
+    """Données de consommation synthétiques partagées entre les classes
+
+    Scope session : les données sont déterministes (seed fixe) et les
+    tests ne font que les lire — inutile de les reconstruire par test.
+    Les tableaux X/y sont livrés prêts pour sklearn (float32, X en
+    colonne) : pas de DataFrame intermédiaire ni d'extraction .values
+    par test.
+    """
+    np.random.seed(42)
+    hours = np.arange(0, 24)
+    # Simulation consommation réaliste (pic matin/soir)
+    base_conso = 50000
+    variation = 15000 * np.sin(hours * np.pi / 12)
+    noise = np.random.normal(0, 2000, len(hours))
+    consumption = base_conso + variation + noise
+
+    return SimpleNamespace(
+        X=hours.reshape(-1, 1).astype(np.float32),
+        y=consumption.astype(np.float32),
+    )